@@ -1,40 +1,89 @@
-from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect, Response, UploadFile, File, Query
-from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
+from fastapi import FastAPI, Depends, Request, HTTPException, WebSocket, WebSocketDisconnect, Response, UploadFile, File, Query
+from fastapi.responses import RedirectResponse, ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from bson import ObjectId
-from urllib.parse import urlencode
-from pathlib import Path
-import tempfile
-import time
-from datetime import datetime, timedelta
+from urllib.parse import urlencode, quote
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from io import BytesIO
 from excelmaker import create_attendance_excel, REGULAR_LEGEND, APPRENTICE_LEGEND
-from sessions import create_session, get_session, delete_session, verify_session, cleanup_expired_sessions, DEFAULT_ADMIN_PERMISSIONS
+from excelparser import init_worker, parse_employee_workbook, parse_holiday_workbook
+from sessions import create_session, get_session, get_session_token, delete_session, verify_session, cleanup_expired_sessions, invalidate_user, DEFAULT_ADMIN_PERMISSIONS
 import pandas as pd
-import pytz
-from pytz import timezone
 import httpx
 import logging
+import multiprocessing
+import queue
+import asyncio
+import base64
+import hashlib
 import os
-import json
+import re
+import orjson
 import calendar
 import secrets
-from collections import defaultdict
-from pymongo.errors import DuplicateKeyError
-from typing import List
+import tempfile
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+from cachetools import TTLCache
+from pymongo import AsyncMongoClient, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from typing import List, Tuple
+from pydantic import BaseModel, ValidationError, field_validator
+from starlette.concurrency import iterate_in_threadpool
+from logging.handlers import QueueHandler, QueueListener
 
 # ===================================
 # Setup
 # ===================================
 load_dotenv()
-app = FastAPI()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def start_log_listener() -> QueueListener:
+    """Route root log records through a queue so the handlers' stream I/O
+    happens on a background thread instead of the event loop.
+
+    QueueHandler.prepare() still formats each record in the calling thread;
+    only the write/flush moves to the listener."""
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def stop_log_listener(listener: QueueListener):
+    """Flush queued records and give the root logger its handlers back."""
+    listener.stop()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, QueueHandler):
+            root.removeHandler(handler)
+    for handler in listener.handlers:
+        root.addHandler(handler)
+
 # MongoDB setup
 MONGO_URI = os.getenv("MONGO_URI")
-client = AsyncIOMotorClient(MONGO_URI, tls=True)
+client = AsyncMongoClient(
+    MONGO_URI,
+    tls=True,
+    maxPoolSize=200,
+    minPoolSize=10,
+    maxIdleTimeMS=300_000,
+    serverSelectionTimeoutMS=5000,
+    retryWrites=True,
+    # Wire compression for bulk uploads/exports; zlib if zstd is unavailable
+    compressors="zstd,zlib",
+)
 db = client["Attendify"]
 collection = db["users"]
 sessions_collection = db["sessions"]
@@ -45,14 +94,325 @@ GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 REDIRECT_URI = os.getenv("REDIRECT_URI")
 FRONTEND_URL = os.getenv("FRONTEND_URL")
 
+# Google consent URL (static, so built once at import)
+GOOGLE_AUTH_URL = "https://accounts.google.com/o/oauth2/v2/auth?" + urlencode(
+    {
+        "client_id": GOOGLE_CLIENT_ID,
+        "response_type": "code",
+        "redirect_uri": REDIRECT_URI,
+        "scope": "openid email profile",
+        "access_type": "offline",
+        "prompt": "consent",
+    },
+    quote_via=quote,
+)
+
+# Google token / userinfo endpoints and the static part of the token request
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
+GOOGLE_TOKEN_DATA = {
+    "client_id": GOOGLE_CLIENT_ID,
+    "client_secret": GOOGLE_CLIENT_SECRET,
+    "redirect_uri": REDIRECT_URI,
+    "grant_type": "authorization_code",
+}
+
+
+
+GOOGLE_ISSUERS = frozenset({"accounts.google.com", "https://accounts.google.com"})
+
+
+def id_token_profile(id_token: str):
+    """Read the profile claims from a Google id_token.
+
+    The token comes straight from Google's token endpoint over TLS, so per
+    OpenID Connect Core 3.1.3.7 (item 6) its signature check may be skipped;
+    the issuer, audience and expiry checks still apply. Returns a
+    userinfo-shaped dict, or None if any check fails or the claims are
+    unusable, in which case the caller asks the userinfo endpoint instead.
+    """
+    try:
+        payload = id_token.split(".")[1]
+        claims = orjson.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (IndexError, ValueError):
+        return None
+    if not isinstance(claims, dict) or not claims.get("email"):
+        return None
+    if claims.get("iss") not in GOOGLE_ISSUERS:
+        return None
+    aud = claims.get("aud")
+    if not GOOGLE_CLIENT_ID or (aud != GOOGLE_CLIENT_ID and not (
+        isinstance(aud, list) and GOOGLE_CLIENT_ID in aud and claims.get("azp") == GOOGLE_CLIENT_ID
+    )):
+        return None
+    exp = claims.get("exp")
+    if not isinstance(exp, (int, float)) or exp <= time.time():
+        return None
+    return {
+        "email": claims["email"],
+        "verified_email": claims.get("email_verified", False),
+        "name": claims.get("name", ""),
+        "picture": claims.get("picture", ""),
+    }
+
 # Superadmin emails
 SUPERADMINS = [email.strip() for email in os.getenv("SUPERADMIN_EMAILS", "").split(",") if email.strip()]
 
 # CORS origins
 ALLOWED_ORIGINS = [origin.strip() for origin in os.getenv("ALLOWED_ORIGINS", "*").split(",") if origin.strip()]
 
-# Kolkata timezone
-kolkata_tz = pytz.timezone("Asia/Kolkata")
+# Kolkata timezone: a fixed +05:30 (India has no DST), so the stdlib tzinfo
+# gives the same times as pytz's Asia/Kolkata without its per-call overhead
+kolkata_tz = timezone(timedelta(hours=5, minutes=30), "IST")
+
+# Audit timestamps (updated_at/created_at) only need second resolution, so a
+# background tick keeps one ready-made IST datetime instead of each write
+# paying for a tz-aware now(). Outside the app's lifespan (scripts, a failed
+# startup) there is no tick, so now_ist() reads the clock directly.
+_now_ist = datetime.now(kolkata_tz).replace(microsecond=0)
+_clock_ticking = False
+
+
+def now_ist() -> datetime:
+    if not _clock_ticking:
+        return datetime.now(kolkata_tz).replace(microsecond=0)
+    return _now_ist
+
+
+async def _tick_clock():
+    global _now_ist, _clock_ticking
+    try:
+        while True:
+            _now_ist = datetime.now(kolkata_tz).replace(microsecond=0)
+            _clock_ticking = True
+            await asyncio.sleep(1)
+    finally:
+        _clock_ticking = False
+
+# Valid attendance codes (part before any "/HH-HH" shift suffix). The UI offers
+# the regular legend for every employee, so both legends are accepted.
+VALID_ATTENDANCE_CODES = frozenset(REGULAR_LEGEND) | frozenset(APPRENTICE_LEGEND)
+
+
+# "YYYY-MM" month keys used by attendance docs and exports
+MONTH_RE = re.compile(r"[0-9]{4}-(0[1-9]|1[0-2])")
+
+
+def check_month(month: str):
+    """Reject malformed month query params up front (400, not a later 500)."""
+    if not MONTH_RE.fullmatch(month):
+        raise HTTPException(status_code=400, detail="Invalid month format. Use YYYY-MM.")
+
+
+def count_codes(statuses) -> Counter:
+    """Count attendance codes, ignoring any "/HH-HH" shift suffix."""
+    return Counter(s.partition("/")[0] for s in statuses)
+
+
+# Aggregation expression for an attendance doc's summary: total_days plus a
+# count per code (ignoring any "/HH-HH" suffix). It is stored on the doc at
+# write time, so the read endpoints never recount.
+ATTENDANCE_SUMMARY_EXPR = {"$let": {
+    "vars": {"codes": {"$map": {
+        "input": {"$objectToArray": {"$ifNull": ["$attendance", {}]}},
+        "in": {"$arrayElemAt": [{"$split": ["$$this.v", "/"]}, 0]},
+    }}},
+    "in": {"$mergeObjects": [
+        {"total_days": {"$size": "$$codes"}},
+        {"$arrayToObject": {"$map": {
+            "input": {"$setUnion": ["$$codes"]},
+            "as": "code",
+            "in": {"k": "$$code", "v": {"$size": {"$filter": {
+                "input": "$$codes", "cond": {"$eq": ["$$this", "$$code"]}
+            }}}},
+        }}},
+    ]},
+}}
+
+# Google userinfo cache (access_token -> userinfo), short-lived
+userinfo_cache = TTLCache(maxsize=1024, ttl=300)
+
+# Digest of the last ingested workbook per upload kind ("employees"/"holidays")
+upload_digests = TTLCache(maxsize=8, ttl=86400)
+
+# Public dashboard payload per day (recomputed at most every 2 minutes),
+# plus the last good one to fall back on if MongoDB is unreachable
+dashboard_cache = TTLCache(maxsize=2, ttl=120)
+dashboard_fallback = {}
+
+# (year, month) -> that month's holidays. holidays_changed() only clears
+# this process's copy, so the TTL matches the dashboard's to bound how long
+# other workers serve holidays from before an upload
+month_holidays_cache = TTLCache(maxsize=24, ttl=120)
+
+# (month, details) -> GET /attendance/monthly rows; add_attendance drops
+# the month it writes to (attendance_changed)
+monthly_cache = TTLCache(maxsize=24, ttl=300)
+
+# (employee type, month) -> rendered export .xlsx bytes. Cleared on any
+# employee or holiday write; attendance writes drop the months they touch.
+export_cache = TTLCache(maxsize=8, ttl=600)
+# Bumped by every export invalidation, so a render that overlapped one
+# knows not to cache what may already be stale
+export_generation = 0
+
+# emp_no -> employee doc for the shift/attendance write paths. Employees
+# change rarely and every employee write clears it (employees_changed).
+employee_cache = TTLCache(maxsize=4096, ttl=600)
+
+# Serialises workbook uploads so concurrent ones cannot stack their memory
+upload_semaphore = asyncio.Semaphore(1)
+
+
+def spool_upload(fileobj, chunk_size: int = 1 << 20) -> Tuple[str, str]:
+    """Copy an upload to a temp .xlsx in fixed-size chunks, hashing it on the way.
+
+    Returns (path, digest). The caller removes the file when done.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    fileobj.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
+        while chunk := fileobj.read(chunk_size):
+            h.update(chunk)
+            tmp.write(chunk)
+    return tmp.name, h.hexdigest()
+
+
+def iter_file(fileobj, chunk_size: int = 1 << 16):
+    """Yield a file's bytes in fixed-size chunks, closing it when done."""
+    try:
+        while chunk := fileobj.read(chunk_size):
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+async def get_employee(emp_no: str):
+    """Fetch an employee by emp_no, served from employee_cache when possible."""
+    emp = employee_cache.get(emp_no)
+    if emp is None:
+        emp = await db["employees"].find_one({"emp_no": emp_no}, projection={"_id": 0})
+        if emp:
+            employee_cache[emp_no] = emp
+    return emp
+
+
+async def session_and_employee(request: Request, emp_no):
+    """Verify the session and look up an employee concurrently.
+
+    The two lookups are independent, so a write endpoint pays one round-trip
+    instead of two. The employee lookup only starts once a session token is
+    present, and is cancelled if that session is rejected, so it is never
+    left running (or filling employee_cache) for a 401. Returns
+    (user, employee-or-None).
+    """
+    if not emp_no or not get_session_token(request):
+        # Without a token verify_session raises 401 before anything else runs
+        return await verify_session(request, sessions_collection), None
+    emp_task = asyncio.create_task(get_employee(str(emp_no).split(".")[0]))
+    try:
+        user = await verify_session(request, sessions_collection)
+    except BaseException:
+        emp_task.cancel()
+        raise
+    return user, await emp_task
+
+
+async def current_user(request: Request) -> dict:
+    """verify_session as a dependency, for routes that only need a login."""
+    return await verify_session(request, sessions_collection)
+
+
+def drop_exports(*keys):
+    """Drop the given cached exports, or all of them when none are given."""
+    global export_generation
+    export_generation += 1
+    if not keys:
+        export_cache.clear()
+    for key in keys:
+        export_cache.pop(key, None)
+
+
+def employees_changed():
+    """Invalidate employee-derived caches after any write to employees."""
+    upload_digests.pop("employees", None)
+    employee_cache.clear()
+    drop_exports()
+
+
+def holidays_changed():
+    """Invalidate holiday-derived caches after any write to holidays."""
+    month_holidays_cache.clear()
+    dashboard_cache.clear()
+    drop_exports()
+
+
+def attendance_changed(month: str):
+    """Invalidate cached listings/exports for a month after an attendance write."""
+    monthly_cache.pop((month, False), None)
+    monthly_cache.pop((month, True), None)
+    # A regular export runs from the 11th to the 10th, so the previous
+    # month's export also shows days from this month
+    year, month_num = int(month[:4]), int(month[5:])
+    previous = f"{year - (month_num == 1):04d}-{(month_num - 2) % 12 + 1:02d}"
+    drop_exports(("apprentice", month), ("regular", month), ("regular", previous))
+
+
+async def parse_in_pool(parser, path: str):
+    """Run a CPU-bound workbook parser in the worker process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(app.state.parse_pool, parser, path)
+
+
+# Employee sheet
+EMPLOYEE_SHEET = "./ATTENDANCE SHEET MUSTER ROLL OF SSEE SW KGP.xlsx"
+
+
+# ===================================
+# App lifespan
+# ===================================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    parse_pool = log_listener = clock_task = http = None
+    try:
+        # Worker processes for Excel parsing (keeps the event loop responsive).
+        # Workers are spawned, not forked: by the first upload this process
+        # has the log listener and pymongo threads, which a fork could copy
+        # mid-lock.
+        parse_pool = app.state.parse_pool = ProcessPoolExecutor(
+            max_workers=2,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        )
+        log_listener = start_log_listener()
+        clock_task = asyncio.create_task(_tick_clock())
+        # Shared HTTP client for Google OAuth calls (keep-alive + HTTP/2)
+        http = app.state.http = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=10.0,
+        )
+        await client.admin.command("ping")  # warm up the Mongo pool
+        await setup_indexes()
+        await backfill_attendance_summaries()
+        yield
+    finally:
+        # Also runs when startup fails part-way, so only undo what started
+        if http:
+            await http.aclose()
+        if parse_pool:
+            parse_pool.shutdown(cancel_futures=True)
+        if clock_task:
+            clock_task.cancel()
+        if log_listener:
+            stop_log_listener(log_listener)
+        await client.close()
+
+
+# Handlers that return a plain dict still go through FastAPI's pure-Python
+# jsonable_encoder before orjson; the list endpoints return ORJSONResponse
+# directly so their (large) payloads are encoded by orjson alone.
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS setup
 app.add_middleware(
@@ -63,9 +423,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Employee sheet
-EMPLOYEE_SHEET = "./ATTENDANCE SHEET MUSTER ROLL OF SSEE SW KGP.xlsx"
-
 
 # ===================================
 # WebSocket Notifications
@@ -73,10 +430,13 @@ EMPLOYEE_SHEET = "./ATTENDANCE SHEET MUSTER ROLL OF SSEE SW KGP.xlsx"
 active_connections: list[WebSocket] = []
 
 async def notify_superadmins(message: dict):
+    # Encode once for every socket; orjson also handles the datetime fields
+    # (e.g. expireAt) that the stdlib json used by send_json rejects.
+    payload = orjson.dumps(message).decode()
     disconnected = []
     for conn in active_connections:
         try:
-            await conn.send_json(message)  # Use JSON for structured messages
+            await conn.send_text(payload)
         except Exception:
             disconnected.append(conn)
     # Clean up disconnected clients
@@ -86,7 +446,7 @@ async def notify_superadmins(message: dict):
 
 
 async def auto_notify(request: Request, actor: str, action: str):
-    now = datetime.now(kolkata_tz)
+    now = now_ist()
     notification = {
         "title": "Unauthorized Action Blocked",
         "message": f"User {actor} attempted to {action}.",
@@ -107,7 +467,7 @@ async def get_notifications(status: str = None):
     notifications = await db["notifications"].find(query).sort("expireAt", -1).to_list(100)
     for n in notifications:
         n["_id"] = str(n["_id"])
-    return notifications
+    return ORJSONResponse(notifications)
 
 @app.post("/notifications/read/{notification_id}")
 async def mark_notification_read(notification_id: str):
@@ -179,51 +539,155 @@ async def get_logged_in_user(request: Request):
 async def health_check():
     return {"message": "Attendify backend active", "status": "OK"}
 
-@app.on_event("startup")
+# (collection, fields) of every unique index setup_indexes creates
+UNIQUE_INDEXES = (
+    (collection, ("email",)),
+    (db["attendance"], ("emp_no", "month")),
+    (db["employees"], ("emp_no",)),
+    (sessions_collection, ("session_id",)),
+)
+
+
+async def find_duplicates(coll, fields: Tuple[str, ...], limit: int = 10) -> list:
+    """Up to `limit` key values that more than one document in `coll` shares."""
+    cursor = await coll.aggregate([
+        {"$group": {"_id": {f: f"${f}" for f in fields}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ], allowDiskUse=True)
+    return await cursor.to_list()
+
+
+async def check_unique_keys():
+    """Refuse to start if a missing unique index would fail on duplicate rows.
+
+    Only collections that lack the index are scanned, so this is a one-off
+    cost. add_attendance's add-only rule relies on the attendance index, so
+    running without it is not an option either.
+    """
+    problems = []
+    for coll, fields in UNIQUE_INDEXES:
+        name = "_".join(f"{f}_1" for f in fields)
+        if name in await coll.index_information():
+            continue
+        duplicates = await find_duplicates(coll, fields)
+        if duplicates:
+            keys = ", ".join(f"{d['_id']} (x{d['count']})" for d in duplicates)
+            logger.error(f"[INDEX] Duplicate {'/'.join(fields)} in {coll.name}: {keys}")
+            problems.append(f"{coll.name}.{'/'.join(fields)}")
+    if problems:
+        raise RuntimeError(
+            f"Remove duplicate documents before starting; unique index blocked on: {', '.join(problems)}"
+        )
+
+
 async def setup_indexes():
-    await db["attendance"].create_index([("emp_no", 1), ("month", 1)], unique=True)
-    await db["employees"].create_index("emp_no", unique=True)
-    await db["shifts"].create_index([("emp_no", 1), ("month", 1)])
-    await sessions_collection.create_index("expiry", expireAfterSeconds=0)
+    await check_unique_keys()
+    # Independent builds, so issue them concurrently
+    await asyncio.gather(
+        collection.create_index("email", unique=True),
+        db["attendance"].create_index([("emp_no", 1), ("month", 1)], unique=True),
+        # Month-leading index for the "all employees in a month" queries
+        db["attendance"].create_index([("month", 1), ("emp_no", 1)]),
+        db["employees"].create_index("emp_no", unique=True),
+        # Employee list: ?emp_type= filter + emp_no sort in one index walk
+        db["employees"].create_index([("type", 1), ("emp_no", 1)]),
+        db["shifts"].create_index([("emp_no", 1), ("date", 1)]),
+        # Day roster: GET /shift?date=... sorted by date
+        db["shifts"].create_index("date"),
+        db["holidays"].create_index("date"),
+        # Notifications carry expireAt; the TTL index also serves the
+        # newest-first listing, the compound one the ?status= filter
+        db["notifications"].create_index("expireAt", expireAfterSeconds=0),
+        db["notifications"].create_index([("status", 1), ("expireAt", -1)]),
+        sessions_collection.create_index("session_id", unique=True),
+        sessions_collection.create_index([("data.email", 1), ("device_info", 1)]),
+        sessions_collection.create_index("expiry", expireAfterSeconds=0),
+    )
     logger.info("Database indexes created.")
 
 
+async def backfill_attendance_summaries():
+    """Store summaries on attendance docs written before they were kept."""
+    result = await db["attendance"].update_many(
+        {"summary": {"$exists": False}},
+        [{"$set": {"summary": ATTENDANCE_SUMMARY_EXPR}}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled {result.modified_count} attendance summaries.")
+
+
 # Home Route
-@app.get("/")
-async def home():
-    today = datetime.now(kolkata_tz)
-    month = today.strftime("%Y-%m")
-    year, month_num = today.year, today.month
+@lru_cache(maxsize=24)
+def month_sundays(year: int, month_num: int) -> Tuple[str, ...]:
+    """A month's Sundays as DD-MM-YYYY strings."""
+    # Column 6 of each Monday-first week; 0 = outside the month
+    return tuple(
+        f"{week[6]:02d}-{month_num:02d}-{year:04d}"
+        for week in calendar.monthcalendar(year, month_num)
+        if week[6]
+    )
 
-    # Sundays
-    cal = calendar.Calendar()
-    sundays = [
-        datetime(year, month_num, day, tzinfo=kolkata_tz).strftime("%d-%m-%Y")
-        for week in cal.monthdayscalendar(year, month_num)
-        for i, day in enumerate(week)
-        if day != 0 and i == 6
-    ]
 
-    # Holidays from DB
-    start_date = datetime(year, month_num, 1).strftime("%Y-%m-%d")
-    end_day = calendar.monthrange(year, month_num)[1]
-    end_date = datetime(year, month_num, end_day).strftime("%Y-%m-%d")
+async def get_month_holidays(year: int, month_num: int) -> list:
+    """A month's holidays as [{date: DD-MM-YYYY, name}], cached for two minutes."""
+    key = (year, month_num)
+    holidays = month_holidays_cache.get(key)
+    if holidays is None:
+        start_date = f"{year:04d}-{month_num:02d}-01"
+        end_date = f"{year:04d}-{month_num:02d}-{calendar.monthrange(year, month_num)[1]:02d}"
+        docs = await db["holidays"].find(
+            {"date": {"$gte": start_date, "$lte": end_date}},
+            projection={"_id": 0, "date": 1, "name": 1}
+        ).to_list(length=None)
+        # Stored as "YYYY-MM-DD"; reorder by slicing rather than strptime
+        holidays = [
+            {"date": f"{d['date'][8:10]}-{d['date'][5:7]}-{d['date'][:4]}", "name": d["name"]}
+            for d in docs
+        ]
+        month_holidays_cache[key] = holidays
+    return holidays
 
-    holidays_cursor = db["holidays"].find({
-        "date": {"$gte": start_date, "$lte": end_date}
-    })
 
-    holidays = []
-    async for doc in holidays_cursor:
-        holidays.append({
-            "date": datetime.strptime(doc["date"], "%Y-%m-%d").strftime("%d-%m-%Y"),
-            "name": doc["name"]
-        })
+async def build_dashboard(today: datetime) -> dict:
+    """Month calendar + attendance snapshot for the public dashboard."""
+    month = today.strftime("%Y-%m")
+    year, month_num = today.year, today.month
+
+    sundays = list(month_sundays(year, month_num))
+
+    # Holidays from DB (cached per month)
+    holidays = await get_month_holidays(year, month_num)
 
     # Attendance snapshot logic
     yesterday = today.date() - timedelta(days=1)
     past_7_days = [today.date() - timedelta(days=i) for i in range(1, 8)]
-    attendance_collection = db["attendance"]
+    date_keys = [d.strftime("%d-%m-%Y") for d in past_7_days]
+
+    # One aggregation for the whole week: attendance maps are keyed
+    # "DD-MM-YYYY" inside per-month docs, so pull out just the seven keys
+    # (rather than unwinding the whole month) and count per (date, code)
+    # server-side. The week spans at most two months.
+    pipeline = [
+        {"$match": {"month": {"$in": sorted({d.strftime("%Y-%m") for d in past_7_days})}}},
+        {"$project": {"_id": 0, "day": [
+            {"k": key, "v": {"$getField": {"field": key, "input": "$attendance"}}}
+            for key in date_keys
+        ]}},
+        {"$unwind": "$day"},
+        {"$match": {"day.v": {"$type": "string"}}},
+        {"$group": {
+            "_id": {
+                "date": "$day.k",
+                "code": {"$arrayElemAt": [{"$split": ["$day.v", "/"]}, 0]},
+            },
+            "n": {"$sum": 1},
+        }},
+    ]
+    per_day = defaultdict(Counter)
+    cursor = await db["attendance"].aggregate(pipeline)
+    for row in await cursor.to_list(length=None):
+        per_day[row["_id"]["date"]][row["_id"]["code"]] += row["n"]
 
     daily_summary = {
         "date": yesterday.strftime("%d-%m-%Y"),
@@ -235,32 +699,22 @@ async def home():
     weekly_summary = defaultdict(int)
     total_days_counted = 0
 
-    for date in past_7_days:
-        date_str = date.strftime("%d-%m-%Y")
-        cursor = attendance_collection.find({f"records.{date_str}": {"$exists": True}})
-        day_present = 0
-        total = 0
-        temp_breakdown = defaultdict(int)
-
-        async for doc in cursor:
-            total += 1
-            status = doc["records"].get(date_str, "")
-            code = status.split("/")[0] if "/" in status else status
-            temp_breakdown[code] += 1
-            if code == "P":
-                day_present += 1
+    for date_str in date_keys:
+        breakdown = per_day.get(date_str, Counter())
+        day_present = breakdown["P"]
+        total = sum(breakdown.values())
 
         if total:
             total_days_counted += 1
             weekly_summary["present"] += day_present
             weekly_summary["total"] += total
-            for k, v in temp_breakdown.items():
+            for k, v in breakdown.items():
                 weekly_summary[k] += v
 
-        if date == yesterday:
+        if date_str == daily_summary["date"]:
             daily_summary["present_count"] = day_present
             daily_summary["total_marked"] = total
-            daily_summary["breakdown"] = dict(temp_breakdown)
+            daily_summary["breakdown"] = dict(breakdown)
 
     weekly_avg_present = (
         weekly_summary["present"] / total_days_counted if total_days_counted else 0
@@ -270,7 +724,6 @@ async def home():
     )
 
     return {
-        "today": today.strftime("%d-%m-%Y %H:%M:%S %Z"),
         "month": month,
         "sundays": sundays,
         "holidays": holidays,
@@ -287,22 +740,36 @@ async def home():
     }
 
 
+@app.get("/")
+async def home():
+    today = datetime.now(kolkata_tz)
+    cache_key = today.strftime("%Y-%m-%d")
+
+    dashboard = dashboard_cache.get(cache_key)
+    if dashboard is None:
+        try:
+            dashboard = await build_dashboard(today)
+        except PyMongoError:
+            # Serve the last good snapshot for today rather than failing
+            dashboard = dashboard_fallback.get(cache_key)
+            if dashboard is None:
+                raise
+            logger.warning("[HOME] MongoDB unavailable; serving last dashboard snapshot")
+        else:
+            dashboard_cache[cache_key] = dashboard
+            dashboard_fallback.clear()
+            dashboard_fallback[cache_key] = dashboard
+
+    return {"today": today.strftime("%d-%m-%Y %H:%M:%S %Z"), **dashboard}
+
+
 # ===================================
 # AUTH — Google OAuth + Sessions
 # ===================================
 @app.get("/auth/google")
 async def login_with_google():
     """Redirect user to Google OAuth"""
-    google_auth_url = (
-        "https://accounts.google.com/o/oauth2/v2/auth"
-        f"?client_id={GOOGLE_CLIENT_ID}"
-        "&response_type=code"
-        f"&redirect_uri={REDIRECT_URI}"
-        "&scope=openid%20email%20profile"
-        "&access_type=offline"
-        "&prompt=consent"
-    )
-    return RedirectResponse(url=google_auth_url)
+    return RedirectResponse(url=GOOGLE_AUTH_URL)
 
 @app.get("/auth/google/callback")
 async def google_callback(request: Request):
@@ -319,21 +786,15 @@ async def google_callback(request: Request):
         raise HTTPException(status_code=400, detail="Missing authorization code")
 
     # --- Exchange authorization code for tokens ---
-    token_url = "https://oauth2.googleapis.com/token"
-    token_data = {
-        "code": code,
-        "client_id": GOOGLE_CLIENT_ID,
-        "client_secret": GOOGLE_CLIENT_SECRET,
-        "redirect_uri": REDIRECT_URI,
-        "grant_type": "authorization_code",
-    }
+    token_data = {**GOOGLE_TOKEN_DATA, "code": code}
+
+    client_http = request.app.state.http
 
     try:
-        async with httpx.AsyncClient() as client_http:
-            token_response = await client_http.post(token_url, data=token_data)
-            token_response.raise_for_status()
-            token_json = token_response.json()
-    except httpx.HTTPError as e:
+        token_response = await client_http.post(GOOGLE_TOKEN_URL, data=token_data)
+        token_response.raise_for_status()
+        token_json = orjson.loads(token_response.content)
+    except (httpx.HTTPError, orjson.JSONDecodeError) as e:
         logger.error(f"[OAUTH] Token exchange failed: {e}")
         raise HTTPException(status_code=500, detail="Google authentication failed")
 
@@ -341,18 +802,22 @@ async def google_callback(request: Request):
     if not access_token:
         raise HTTPException(status_code=500, detail="No access token received")
 
-    # --- Get user info from Google ---
-    try:
-        async with httpx.AsyncClient() as client_http:
+    # --- Get user info: id_token claims, else Google userinfo (cached) ---
+    # The token response already carries the profile for the "openid email
+    # profile" scope, which saves a second request to another Google host.
+    user_info = id_token_profile(token_json.get("id_token", "")) or userinfo_cache.get(access_token)
+    if user_info is None:
+        try:
             userinfo_response = await client_http.get(
-                "https://www.googleapis.com/oauth2/v2/userinfo",
+                GOOGLE_USERINFO_URL,
                 headers={"Authorization": f"Bearer {access_token}"}
             )
             userinfo_response.raise_for_status()
-            user_info = userinfo_response.json()
-    except httpx.HTTPError as e:
-        logger.error(f"[OAUTH] Userinfo fetch failed: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch user info")
+            user_info = orjson.loads(userinfo_response.content)
+        except (httpx.HTTPError, orjson.JSONDecodeError) as e:
+            logger.error(f"[OAUTH] Userinfo fetch failed: {e}")
+            raise HTTPException(status_code=500, detail="Failed to fetch user info")
+        userinfo_cache[access_token] = user_info
 
     user_email = user_info["email"]
     role = "superadmin" if user_email in SUPERADMINS else "admin"
@@ -363,28 +828,58 @@ async def google_callback(request: Request):
         "name": user_info.get("name", ""),
         "picture": user_info.get("picture", ""),
         "role": role,
-        "updated_at": datetime.now(kolkata_tz),
-        "permissions": DEFAULT_ADMIN_PERMISSIONS.copy() if role == "admin" else None,
+        "updated_at": now_ist(),
     }
 
-    # --- Upsert user record in MongoDB ---
-    try:
-        await collection.update_one(
-            {"email": user_email},
-            {"$set": user_data, "$setOnInsert": {"created_at": datetime.now(kolkata_tz)}},
-            upsert=True
-        )
-        logger.info(f"[USER] Logged in: {user_email} ({role})")
-    except Exception as e:
-        logger.error(f"[MongoDB] User save failed: {e}")
+    # --- User record upsert (single round-trip) ---
+    # Permissions are only seeded on first login so that grants made by a
+    # superadmin are not reset every time the admin signs in again. They are
+    # kept out of user_data (and so the session), as verify_session always
+    # merges the current permissions from the user record.
+    user_update = {
+        "$set": user_data,
+        "$setOnInsert": {
+            "created_at": user_data["updated_at"],
+            "permissions": DEFAULT_ADMIN_PERMISSIONS.copy() if role == "admin" else None,
+        },
+    }
+
+    async def save_user():
+        try:
+            await collection.update_one({"email": user_email}, user_update, upsert=True)
+        except DuplicateKeyError:
+            # Two first logins raced and the other one inserted the user;
+            # the unique email index guarded it, so the retry just matches.
+            await collection.update_one({"email": user_email}, user_update)
+
+    # --- Save user and create or reuse session concurrently ---
+    # The session write only needs user_data, not the stored user record.
+    device_info = request.headers.get("user-agent", "unknown")
+    user_saved, session_id = await asyncio.gather(
+        save_user(),
+        create_session(sessions_collection, user_email, device_info, user_data),
+        return_exceptions=True,
+    )
+
+    for outcome in (user_saved, session_id):
+        # return_exceptions also collects cancellations; those must propagate
+        if isinstance(outcome, BaseException) and not isinstance(outcome, Exception):
+            raise outcome
+
+    if isinstance(user_saved, Exception):
+        logger.error(f"[MongoDB] User save failed: {user_saved}")
+        if isinstance(session_id, str):
+            # The login failed, so don't leave its session usable for a week
+            try:
+                await delete_session(sessions_collection, session_id)
+            except Exception as e:
+                logger.error(f"[SESSION] Cleanup failed: {e}")
         raise HTTPException(status_code=500, detail="User database update failed")
+    invalidate_user(user_email)
+    logger.info(f"[USER] Logged in: {user_email} ({role})")
 
-    # --- Create or reuse session ---
-    try:
-        device_info = request.headers.get("user-agent", "unknown")
-        session_id = await create_session(sessions_collection, user_email, device_info, user_data)
-    except Exception as e:
-        logger.error(f"[SESSION] Creation failed: {e}")
+    if isinstance(session_id, Exception):
+        logger.error(f"[SESSION] Creation failed: {session_id}")
         raise HTTPException(status_code=500, detail="Session creation failed")
 
     # --- Redirect to frontend with session cookie ---
@@ -407,17 +902,7 @@ async def google_callback(request: Request):
 
 @app.post("/logout")
 async def logout(request: Request, response: Response):
-    session_id = None
-
-    # 1. Try Authorization header
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        session_id = auth_header.split("Bearer ")[1].strip()
-
-    # 2. If missing, try cookie
-    if not session_id:
-        session_id = request.cookies.get("session_id")
-
+    session_id = get_session_token(request)
     if not session_id:
         raise HTTPException(status_code=400, detail="No session token provided")
 
@@ -462,6 +947,7 @@ async def add_employee(request: Request, data: dict):
 
     try:
         await db["employees"].insert_one(data)
+        employees_changed()
 
     except DuplicateKeyError:
         raise HTTPException(
@@ -484,98 +970,50 @@ async def upload_employees(request: Request, file: UploadFile = File(...)):
         await auto_notify(request, user["email"], "attempted to upload employees")
         raise HTTPException(status_code=403, detail="Only superadmin can upload employees")
 
-    # --- Load Excel ---
-    try:
-        df_excel = pd.ExcelFile(file.file)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Error reading Excel file: {e}")
-
-    # --- Attendance sheets to process ---
-    regular_sheets = [
-        "ATTENDANCE_SSEE_SW_KGP_I",
-        "ATTENDANCE_SSEE_SW_KGP_II",
-        "ATTENDANCE_SSEE_SW_KGP_III"
-    ]
-    apprentice_sheet = "APPRENTICE ATTENDANCE"
+    # One upload at a time per process (bounds parse + DB write memory)
+    async with upload_semaphore:
+        # --- Spool to disk in chunks (hashing on the way) ---
+        path, digest = await asyncio.to_thread(spool_upload, file.file)
+        try:
+            # --- Skip re-processing an identical workbook ---
+            if upload_digests.get("employees") == digest:
+                return {
+                    "message": "Employee file unchanged since last upload; nothing to update.",
+                    "summary": {"added": 0, "updated": 0, "unchanged": 0, "skipped": 0},
+                    "total_processed": 0
+                }
 
-    all_employees = []
+            # --- Parse Excel (single read-only pass, in a worker process) ---
+            try:
+                all_employees = await parse_in_pool(parse_employee_workbook, path)
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Error reading Excel file: {e}")
+        finally:
+            os.remove(path)
 
-    # --- Process regular attendance sheets only ---
-    for sheet in regular_sheets:
-        if sheet not in df_excel.sheet_names:
-            continue
-        try:
-            df = df_excel.parse(sheet_name=sheet, skiprows=6)
-            df.rename(columns={
-                "S. NO.": "S_No",
-                "NAME": "Name",
-                "DESIGNATION": "Designation",
-                "EMPLOYEE NO.": "Employee_No"
-            }, inplace=True)
-            df = df.dropna(subset=["Employee_No"])
-
-            for _, row in df.iterrows():
-                all_employees.append({
-                    "emp_no": str(row["Employee_No"]).strip().split(".")[0].replace(" ", ""),
-                    "name": str(row["Name"]).strip(),
-                    "designation": str(row["Designation"]).strip(),
-                    "type": "regular"
-                })
-        except Exception as e:
-            logger.warning(f"Error reading regular sheet {sheet}: {e}")
-            continue
+        if not all_employees:
+            raise HTTPException(status_code=400, detail="No employee data found in the attendance sheets.")
 
-    # --- Process apprentice attendance sheet only ---
-    if apprentice_sheet in df_excel.sheet_names:
-        try:
-            df = df_excel.parse(sheet_name=apprentice_sheet, skiprows=8)
-            df.rename(columns={
-                "S. NO.": "S_No",
-                "NAME": "Name",
-                "DESIGNATION": "Designation",
-                "EMPLOYEE NO.": "Employee_No"
-            }, inplace=True)
-            df = df.dropna(subset=["Employee_No"])
-
-            for _, row in df.iterrows():
-                all_employees.append({
-                    "emp_no": str(row["Employee_No"]).strip().split(".")[0].replace(" ", ""),
-                    "name": str(row["Name"]).strip(),
-                    "designation": str(row["Designation"]).strip(),
-                    "type": "apprentice"
-                })
-        except Exception as e:
-            logger.warning(f"Error reading apprentice sheet: {e}")
-
-    if not all_employees:
-        raise HTTPException(status_code=400, detail="No employee data found in the attendance sheets.")
-
-    # --- Insert / Update DB ---
-    emp_collection = db["employees"]
-    added, updated, unchanged = 0, 0, 0
-
-    for emp in all_employees:
-        existing = await emp_collection.find_one({"emp_no": emp["emp_no"]})
-        if existing:
-            if existing != emp:
-                await emp_collection.update_one({"emp_no": emp["emp_no"]}, {"$set": emp})
-                updated += 1
-            else:
-                unchanged += 1
-        else:
-            await emp_collection.insert_one(emp)
-            added += 1
+        # --- Insert / Update DB (one unordered bulk upsert) ---
+        ops = [UpdateOne({"emp_no": emp["emp_no"]}, {"$set": emp}, upsert=True) for emp in all_employees]
+        result = await db["employees"].bulk_write(ops, ordered=False)
+        employees_changed()
 
-    return {
-        "message": "Employee attendance upload completed.",
-        "summary": {
-            "added": added,
-            "updated": updated,
-            "unchanged": unchanged,
-            "skipped": 0
-        },
-        "total_processed": len(all_employees)
-    }
+        added = result.upserted_count
+        updated = result.modified_count
+        unchanged = result.matched_count - result.modified_count
+        upload_digests["employees"] = digest
+
+        return {
+            "message": "Employee attendance upload completed.",
+            "summary": {
+                "added": added,
+                "updated": updated,
+                "unchanged": unchanged,
+                "skipped": 0
+            },
+            "total_processed": len(all_employees)
+        }
 
 
 @app.patch("/employees/{emp_no}")
@@ -595,11 +1033,6 @@ async def edit_employee(emp_no: str, payload: dict, request: Request):
         # Notify admin activity
         notify_msg = f"edited employee {emp_no}"
 
-    # Fetch employee
-    emp = await db["employees"].find_one({"emp_no": emp_no})
-    if not emp:
-        raise HTTPException(status_code=404, detail="Employee not found")
-
     # Only editable fields
     editable_fields = ["name", "designation", "type"]
     update_data = {k: v for k, v in payload.items() if k in editable_fields}
@@ -607,7 +1040,11 @@ async def edit_employee(emp_no: str, payload: dict, request: Request):
     if not update_data:
         raise HTTPException(status_code=400, detail="No valid fields provided for update")
 
-    await db["employees"].update_one({"emp_no": emp_no}, {"$set": update_data})
+    # The update doubles as the existence check
+    result = await db["employees"].update_one({"emp_no": emp_no}, {"$set": update_data})
+    if not result.matched_count:
+        raise HTTPException(status_code=404, detail="Employee not found")
+    employees_changed()
 
     # Only notify if admin
     if user["role"] == "admin":
@@ -635,58 +1072,59 @@ async def delete_employee(emp_no: str, request: Request):
     result = await db["employees"].delete_one({"emp_no": emp_no})
     if not result.deleted_count:
         raise HTTPException(status_code=404, detail="Employee not found")
+    employees_changed()
 
     return {"message": f"Employee {emp_no} deleted successfully"}
 
 
-@app.get("/employees")
+@app.get("/employees", dependencies=[Depends(current_user)])
 async def get_employees(
-    request: Request,
     skip: int = 0,
     limit: int = 10,
     search: str = "",
     emp_type: str = "",
 ):
-    await verify_session(request, sessions_collection)
-
     query = {}
 
     if search:
+        # Match the text literally, not as a user-supplied regex. Unanchored
+        # substring matches can't use an index, so a search scans every
+        # employee; that keeps partial emp_no/name lookups working.
+        pattern = re.escape(search)
         query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"designation": {"$regex": search, "$options": "i"}},
-            {"emp_no": {"$regex": search, "$options": "i"}},
+            {"name": {"$regex": pattern, "$options": "i"}},
+            {"designation": {"$regex": pattern, "$options": "i"}},
+            {"emp_no": {"$regex": pattern, "$options": "i"}},
         ]
 
     if emp_type:
         query["type"] = emp_type.lower()
 
-    total = await db["employees"].count_documents(query)
-
     cursor = (
         db["employees"]
-        .find(query)
+        .find(query, projection={"_id": 0})
         .sort("emp_no", 1)
         .skip(skip)
         .limit(limit)
     )
 
-    employees = await cursor.to_list(length=limit)
-    for e in employees:
-        e["_id"] = str(e["_id"])
+    # Page and total are independent reads
+    total, employees = await asyncio.gather(
+        db["employees"].count_documents(query),
+        cursor.to_list(length=limit),
+    )
 
-    return {
+    return ORJSONResponse({
         "employees": employees,
         "total": total,
         "skip": skip,
         "limit": limit,
         "page": skip // limit,
-    }
+    })
 
 
-@app.get("/employees/count")
-async def get_employee_count(request: Request, response: Response):
-    await verify_session(request, sessions_collection)
+@app.get("/employees/count", dependencies=[Depends(current_user)])
+async def get_employee_count():
     count = await db.employees.count_documents({})
     return {"count": count}
 
@@ -707,7 +1145,7 @@ async def add_holiday(request: Request, data: dict):
     # Validate date
     try:
         date_obj = pd.to_datetime(data["date"], dayfirst=True, errors="raise")
-    except:
+    except (TypeError, ValueError):
         raise HTTPException(status_code=400, detail="Invalid date format")
 
     holiday_doc = {
@@ -715,11 +1153,13 @@ async def add_holiday(request: Request, data: dict):
         "date": date_obj.strftime("%Y-%m-%d"),
         "day": date_obj.strftime("%A"),
         "year": date_obj.year,
-        "created_at": datetime.now(kolkata_tz),
+        "created_at": now_ist(),
         "created_by": user["email"],
     }
 
     result = await db["holidays"].insert_one(holiday_doc)
+    upload_digests.pop("holidays", None)
+    holidays_changed()
 
     # MongoDB added ObjectId to holiday_doc → clean it
     clean_doc = dict(holiday_doc)
@@ -738,130 +1178,88 @@ async def list_holidays():
     for h in holidays:
         h["_id"] = str(h["_id"])
 
-    return {"holidays": holidays, "count": len(holidays)}
+    return ORJSONResponse({"holidays": holidays, "count": len(holidays)})
 
 
 @app.post("/upload/holidays")
 async def upload_holidays(request: Request, file: UploadFile = File(...)):
     user = await verify_session(request, sessions_collection)
     created_by = user.get("email")
-    # Save uploaded file to temp
-    try:
-        suffix = Path(file.filename).suffix or ".xlsx"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            temp_path = tmp.name
-            tmp.write(await file.read())
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to save uploaded file: {e}")
-
-    try:
-        # Debug: show filename (useful to confirm correct file from client)
-        logger.info(f"[HOLIDAYS UPLOAD] Uploaded filename: {file.filename}")
-
-        # Open workbook and auto-detect sheet containing "holiday"
+    # One upload at a time per process (bounds parse + DB write memory)
+    async with upload_semaphore:
+        # Spool the upload to disk in chunks (the workbook is never fully buffered)
         try:
-            with pd.ExcelFile(temp_path) as xl:
-                sheets = xl.sheet_names
-                logger.info(f"[HOLIDAYS UPLOAD] Sheets found: {sheets}")
-
-                # Build normalized map: normalized_name -> actual_name
-                normalized = {s.strip().lower(): s for s in sheets}
-
-                # Prefer exact "holidays" or any sheet that contains "holiday"
-                sheet = None
-                if "holidays" in normalized:
-                    sheet = normalized["holidays"]
-                else:
-                    for sname in sheets:
-                        if "holiday" in sname.lower():
-                            sheet = sname
-                            break
-
-                if not sheet:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"No HOLIDAYS sheet found. Sheets detected: {sheets}"
-                    )
-
-                # Parse with header row at index 1
-                df = xl.parse(sheet_name=sheet, header=1)
-        except HTTPException:
-            raise
+            path, digest = await asyncio.to_thread(spool_upload, file.file)
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error reading Excel file: {e}")
-
-        # Normalize column names
-        df.columns = [str(c).strip() for c in df.columns]
-
-        # Validate required columns
-        required = {"Name of the Occasion", "Date"}
-        missing = required - set(df.columns)
-        if missing:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required columns: {sorted(list(missing))}. Found columns: {list(df.columns)}"
-            )
+            raise HTTPException(status_code=500, detail=f"Failed to read uploaded file: {e}")
 
-        # Drop rows missing essential data
-        df_filtered = df.dropna(subset=["Name of the Occasion", "Date"])
-
-        holidays = []
-        for _, r in df_filtered.iterrows():
-            name = str(r["Name of the Occasion"]).strip()
-            date_raw = str(r["Date"]).strip()
-            # parse with dayfirst; coerce invalid -> NaT
-            date_obj = pd.to_datetime(date_raw, dayfirst=True, errors="coerce")
-            if pd.isna(date_obj):
-                logger.warning(f"[HOLIDAYS UPLOAD] Skipping invalid date: {date_raw} for '{name}'")
-                continue
+        try:
+            # Skip re-processing an identical workbook
+            if upload_digests.get("holidays") == digest:
+                return {"message": "Holiday file unchanged since last upload; nothing to update.", "sample": []}
 
-            holidays.append({
-                "name": name,
-                "date": date_obj.strftime("%Y-%m-%d"),
-                "day": r.get("Day", ""),
-                "year": int(r.get("Year", date_obj.year)),
-                "created_at": datetime.now(kolkata_tz),
-                "created_by": created_by
-            })
-
-        if not holidays:
-            raise HTTPException(status_code=400, detail="No valid holiday rows found after parsing.")
-
-        # Save to DB
-        hol_collection = db["holidays"]
-        await hol_collection.delete_many({})
-        await hol_collection.insert_many(holidays)
-
-        # Clean sample so it contains no ObjectId
-        clean_sample = []
-        for h in holidays[:5]:
-            h2 = dict(h)
-            h2.pop("_id", None)   # remove ObjectId
-            clean_sample.append(h2)
+            # Debug: show filename (useful to confirm correct file from client)
+            logger.info(f"[HOLIDAYS UPLOAD] Uploaded filename: {file.filename}")
 
-        return {
-            "message": f"{len(holidays)} holidays uploaded successfully.",
-            "sample": clean_sample
-        }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.exception("[HOLIDAYS UPLOAD] Unexpected error")
-        raise HTTPException(status_code=500, detail=f"Error parsing holidays: {e}")
-    finally:
-        # Cleanup temp file
-        try:
-            os.remove(temp_path)
-        except PermissionError:
-            # brief pause then retry
-            time.sleep(0.2)
+            # Parse the HOLIDAYS sheet (auto-detected) in read-only mode, in a worker process
             try:
-                os.remove(temp_path)
-            except Exception:
-                logger.warning(f"Could not delete temp file {temp_path} after retry.")
-        except Exception:
-            logger.warning(f"Could not delete temp file {temp_path}.")
+                holiday_rows = await parse_in_pool(parse_holiday_workbook, path)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Error reading Excel file: {e}")
+
+            # Parse all dates in one vectorized call (dayfirst; invalid -> NaT)
+            dates = pd.to_datetime(
+                pd.Series([r["date"] for r in holiday_rows], dtype=object),
+                dayfirst=True, errors="coerce", format="mixed"
+            )
+
+            # Exact clock: created_at doubles as this upload's version stamp
+            created_at = datetime.now(kolkata_tz)
+            holidays = []
+            for r, date_obj in zip(holiday_rows, dates):
+                name = r["name"]
+                if pd.isna(date_obj):
+                    logger.warning(f"[HOLIDAYS UPLOAD] Skipping invalid date: {r['date']} for '{name}'")
+                    continue
+
+                holidays.append({
+                    "name": name,
+                    "date": date_obj.strftime("%Y-%m-%d"),
+                    "day": r["day"],
+                    "year": int(r["year"]) if r["year"] is not None else date_obj.year,
+                    "created_at": created_at,
+                    "created_by": created_by
+                })
+
+            if not holidays:
+                raise HTTPException(status_code=400, detail="No valid holiday rows found after parsing.")
+
+            # Save to DB: upsert each (date, name), then drop rows this upload
+            # did not stamp, so readers never see an empty collection
+            hol_collection = db["holidays"]
+            ops = [
+                UpdateOne({"date": h["date"], "name": h["name"]}, {"$set": h}, upsert=True)
+                for h in holidays
+            ]
+            await hol_collection.bulk_write(ops, ordered=False)
+            await hol_collection.delete_many({"created_at": {"$ne": created_at}})
+            upload_digests["holidays"] = digest
+            holidays_changed()
+
+            return {
+                "message": f"{len(holidays)} holidays uploaded successfully.",
+                "sample": holidays[:5]  # bulk_write does not add ObjectIds
+            }
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.exception("[HOLIDAYS UPLOAD] Unexpected error")
+            raise HTTPException(status_code=500, detail=f"Error parsing holidays: {e}")
+        finally:
+            os.remove(path)
 
 
 # ===================================
@@ -869,9 +1267,9 @@ async def upload_holidays(request: Request, file: UploadFile = File(...)):
 # ===================================
 @app.post("/shift")
 async def assign_shift(request: Request, data: dict):
-    user = await verify_session(request, sessions_collection)
-
     emp_no = data.get("emp_no")
+    user, emp = await session_and_employee(request, emp_no)
+
     name_query = data.get("name")
     shift = data.get("shift")
     date = data.get("date")
@@ -879,13 +1277,10 @@ async def assign_shift(request: Request, data: dict):
     if not shift or not date:
         raise HTTPException(status_code=400, detail="shift and date required")
 
-    # ----- Step 1: Fetch employee -----
-    emp = None
-
+    # ----- Step 1: Resolve employee (emp_no was fetched with the session) -----
     if emp_no:
-        clean_no = str(emp_no).split(".")[0]
-        emp = await db["employees"].find_one({"emp_no": clean_no})
         if not emp:
+            clean_no = str(emp_no).split(".")[0]
             raise HTTPException(status_code=404, detail=f"Employee not found for emp_no {clean_no}")
 
     elif name_query:
@@ -898,7 +1293,7 @@ async def assign_shift(request: Request, data: dict):
             raise HTTPException(status_code=404, detail=f"No employees found matching '{name_query}'")
 
         if len(matches) > 1:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=409,
                 content={
                     "detail": "Multiple employees match this name",
@@ -919,49 +1314,47 @@ async def assign_shift(request: Request, data: dict):
 
     cleaned_emp_no = str(emp["emp_no"]).split(".")[0]
 
-    # ----- Step 2: Check existing shift -----
-    existing_shift = await db["shifts"].find_one(
-        {"emp_no": cleaned_emp_no, "date": date}
-    )
-
     # ❌ Admin cannot edit, only add
     if user["role"] == "admin":
         if not user.get("permissions", {}).get("can_add_shift", False):
             await auto_notify(request, user["email"], "add shift")
             raise HTTPException(status_code=403, detail="Permission denied")
 
-        if existing_shift:
-            await auto_notify(request, user["email"], "EDIT shift")
-            raise HTTPException(status_code=403, detail="Admins cannot edit shift")
-
-    # ----- Step 3: Upsert shift -----
+    # ----- Step 2: Upsert shift -----
     doc = {
         "emp_no": cleaned_emp_no,
         "name": emp["name"],
         "designation": emp.get("designation", ""),
         "shift": shift,
         "date": date,
-        "updated_at": datetime.now(kolkata_tz),
+        "updated_at": now_ist(),
         "updated_by": user["email"],
     }
 
-    await db["shifts"].update_one(
+    # Admins only insert ($setOnInsert leaves an existing shift untouched),
+    # so one round-trip both writes and tells us whether the date was taken.
+    op = "$setOnInsert" if user["role"] == "admin" else "$set"
+    result = await db["shifts"].update_one(
         {"emp_no": cleaned_emp_no, "date": date},
-        {"$set": doc},
+        {op: doc},
         upsert=True
     )
+    existed = result.upserted_id is None
+
+    if existed and user["role"] == "admin":
+        await auto_notify(request, user["email"], "EDIT shift")
+        raise HTTPException(status_code=403, detail="Admins cannot edit shift")
 
     return {
         "message": f"Shift {shift} assigned to {emp['name']} ({cleaned_emp_no}) on {date}",
-        "updated": existing_shift is not None,
-        "added": existing_shift is None,
+        "updated": existed,
+        "added": not existed,
         "shift_record": doc
     }
 
 
-@app.get("/shift")
+@app.get("/shift", dependencies=[Depends(current_user)])
 async def get_shifts(
-    request: Request,
     date: str = None,           # optional filter by date YYYY-MM-DD
     emp_no: str = None,         # optional filter by employee number
     skip: int = 0,
@@ -970,8 +1363,6 @@ async def get_shifts(
     """
     Fetch shifts. Can filter by date or employee number.
     """
-    await verify_session(request, sessions_collection)
-
     query = {}
 
     if date:
@@ -989,21 +1380,53 @@ async def get_shifts(
     for s in shifts:
         s["_id"] = str(s["_id"])
 
-    return {
+    return ORJSONResponse({
         "shifts": shifts,
         "total": total,
         "skip": skip,
         "limit": limit,
         "page": skip // limit
-    }
+    })
 
 
 # ===================================
 # ATTENDANCE
 # ===================================
+class AttendanceIn(BaseModel):
+    """POST /attendance payload (parsed and checked by pydantic-core)."""
+    emp_no: str
+    date: date
+    code: str
+
+    @field_validator("emp_no", mode="before")
+    @classmethod
+    def clean_emp_no(cls, value):
+        return str(value).split(".")[0]
+
+    @field_validator("code", mode="before")
+    @classmethod
+    def known_code(cls, value):
+        code = str(value).strip()
+        if code.partition("/")[0] not in VALID_ATTENDANCE_CODES:
+            raise ValueError(f"Invalid attendance code: {code}")
+        return code
+
+
+def attendance_error(exc: ValidationError) -> str:
+    """Turn the first validation error into the endpoint's 400 message."""
+    err = exc.errors()[0]
+    if err["type"] == "missing":
+        return f"Fields required: {list(AttendanceIn.model_fields)}"
+    if err["loc"] and err["loc"][0] == "date":
+        return "Invalid date format. Use YYYY-MM-DD."
+    if "error" in err.get("ctx", {}):
+        return str(err["ctx"]["error"])
+    return err["msg"]
+
+
 @app.post("/attendance")
 async def add_attendance(request: Request, data: dict):
-    user = await verify_session(request, sessions_collection)
+    user, emp = await session_and_employee(request, data.get("emp_no"))
 
     # --- Role validation ---
     if user["role"] not in ["superadmin", "admin"]:
@@ -1015,185 +1438,191 @@ async def add_attendance(request: Request, data: dict):
             await auto_notify(request, user["email"], "add attendance")
             raise HTTPException(status_code=403, detail="Permission denied")
 
-    # --- Required fields ---
-    required = ["emp_no", "date", "code"]
-    if not all(k in data for k in required):
-        raise HTTPException(status_code=400, detail=f"Fields required: {required}")
+    # --- Parse + validate payload (fields, code, date) ---
+    # Validated here rather than as a typed body parameter so that clients
+    # keep getting a 400 with a plain-string detail.
+    try:
+        payload = AttendanceIn.model_validate(data)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=attendance_error(e))
+    code, date_obj = payload.code, payload.date
 
-    emp_no_clean = str(data["emp_no"]).split(".")[0]
-    emp = await db["employees"].find_one({"emp_no": emp_no_clean})
     if not emp:
         raise HTTPException(status_code=404, detail=f"Employee {data['emp_no']} not found")
 
     # --- Date formatting ---
-    date_obj = datetime.strptime(data["date"], "%Y-%m-%d")
     month_str = date_obj.strftime("%Y-%m")
     date_key = date_obj.strftime("%d-%m-%Y")
 
-    # --- Fetch existing record ---
-    existing = await db["attendance"].find_one(
-        {"emp_no": emp["emp_no"], "month": month_str}
-    )
-
-    # Admin cannot edit existing dates
-    if user["role"] == "admin" and existing and date_key in existing.get("attendance", {}):
-        await auto_notify(request, user["email"], "edit attendance")
-        raise HTTPException(status_code=403, detail="Admins cannot edit attendance")
-
-    # --- Build sorted attendance dictionary ---
-    attendance_map = existing.get("attendance", {}) if existing else {}
-    attendance_map[date_key] = data["code"]
-
-    # Sort dates
-    sorted_attendance = dict(sorted(
-        attendance_map.items(),
-        key=lambda x: datetime.strptime(x[0], "%d-%m-%Y")
-    ))
-
-    # --- Save to DB ---
-    await db["attendance"].update_one(
-        {"emp_no": emp["emp_no"], "month": month_str},
-        {"$set": {
-            "attendance": sorted_attendance,
-            "emp_name": emp["name"],
-            "type": emp["type"],
-            "updated_by": user["email"]
-        }},
-        upsert=True
-    )
+    # --- Upsert in a single round-trip ---
+    # Admins may only add: their filter skips a month that already holds this
+    # date, so an edit attempt becomes an insert that hits the unique
+    # (emp_no, month) index instead of overwriting the existing code.
+    att_filter = {"emp_no": emp["emp_no"], "month": month_str}
+    if user["role"] == "admin":
+        att_filter[f"attendance.{date_key}"] = {"$exists": False}
+
+    att_update = [{"$set": {
+        # Merge the new code and keep the map sorted; keys are
+        # "DD-MM-YYYY" within one month, so sorting by key sorts by day.
+        "attendance": {"$arrayToObject": {"$sortArray": {
+            "input": {"$objectToArray": {"$mergeObjects": [
+                {"$ifNull": ["$attendance", {}]},
+                {"$literal": {date_key: code}},
+            ]}},
+            "sortBy": {"k": 1},
+        }}},
+        "emp_name": {"$literal": emp["name"]},
+        "type": {"$literal": emp["type"]},
+        "updated_by": {"$literal": user["email"]},
+    }}, {"$set": {"summary": ATTENDANCE_SUMMARY_EXPR}}]
 
+    try:
+        result = await db["attendance"].update_one(att_filter, att_update, upsert=True)
+    except DuplicateKeyError:
+        # Either the date is already marked (an admin edit attempt) or another
+        # request created this month's doc first; retry once as a plain update
+        # to tell the two apart.
+        result = await db["attendance"].update_one(att_filter, att_update)
+        if not result.matched_count:
+            await auto_notify(request, user["email"], "edit attendance")
+            raise HTTPException(status_code=403, detail="Admins cannot edit attendance")
+    attendance_changed(month_str)
+
+    existed = result.upserted_id is None
     return {
         "message": f"Attendance added for {emp['emp_no']} - {emp['name']} on {data['date']}",
-        "updated": existing is not None,
-        "added": existing is None
+        "updated": existed,
+        "added": not existed
     }
 
 
 # Daily attendance summary for all employees
-@app.get("/attendance/daily_summary")
-async def get_daily_summary(date: str, request: Request):
-    await verify_session(request, sessions_collection)
-
+@app.get("/attendance/daily_summary", dependencies=[Depends(current_user)])
+async def get_daily_summary(date: str):
     try:
         date_obj = datetime.strptime(date, "%Y-%m-%d")
         date_key = date_obj.strftime("%d-%m-%Y")
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
 
-    cursor = db["attendance"].find({f"attendance.{date_key}": {"$exists": True}})
+    # The month narrows the scan to one index range of (month, emp_no)
+    records = await db["attendance"].find(
+        {"month": date_obj.strftime("%Y-%m"), f"attendance.{date_key}": {"$exists": True}},
+        projection={"_id": 0, f"attendance.{date_key}": 1}
+    ).batch_size(500).to_list(length=None)
 
-    code_counts = defaultdict(int)
-    total_marked = 0
-
-    async for record in cursor:
-        total_marked += 1
-        status = record["attendance"].get(date_key, "")
-        code = status.split("/")[0] if "/" in status else status
-        code_counts[code] += 1
+    code_counts = count_codes(record["attendance"].get(date_key, "") for record in records)
 
     return {
         "date": date,
-        "total_marked": total_marked,
-        "breakdown": dict(code_counts) 
+        "total_marked": sum(code_counts.values()),
+        "breakdown": dict(code_counts)
     }
 
 
 # Monthly attendance summary for all employees
-@app.get("/attendance/monthly")
-async def get_monthly_attendance(month: str, request: Request):
-    await verify_session(request, sessions_collection)
-    cursor = db["attendance"].find({"month": month})
-    result = []
-
-    async for record in cursor:
-        attendance = record.get("attendance", {})
-        total_days = len(attendance)
-        code_counts = defaultdict(int)
-        for status in attendance.values():
-            code = status.split("/")[0] if "/" in status else status
-            code_counts[code] += 1
-
-        summary = {
-            "total_days": total_days,
-            **code_counts  # dynamically include all codes
-        }
-
-        result.append({
-            "emp_no": record["emp_no"],
-            "emp_name": record.get("emp_name"),
-            "type": record.get("type"),
-            "attendance": attendance,
-            "summary": dict(summary)
-        })
-
-    return {"month": month, "employees": result, "total_employees": len(result)}
+@app.get("/attendance/monthly", dependencies=[Depends(current_user)])
+async def get_monthly_attendance(month: str, details: bool = False):
+    check_month(month)
+    key = (month, details)
+    result = monthly_cache.get(key)
+    if result is None:
+        # Summaries are stored with each doc at write time, so this is a plain
+        # read; the per-day map (most of each doc) is only sent when asked for
+        projection = {"_id": 0, "emp_no": 1, "emp_name": 1, "type": 1, "summary": 1}
+        if details:
+            projection["attendance"] = 1
+        result = await db["attendance"].find(
+            {"month": month}, projection=projection
+        ).sort("emp_no", 1).batch_size(500).to_list(length=None)
+        monthly_cache[key] = result
+
+    return ORJSONResponse({"month": month, "employees": result, "total_employees": len(result)})
+
+
+# Attendance code legends (declared before /attendance/{emp_no} so it is not shadowed)
+@app.get("/attendance/legend")
+async def get_attendance_legend():
+    return {
+        "regular": REGULAR_LEGEND,
+        "apprentice": APPRENTICE_LEGEND,
+        "message": "Attendance code legends"
+    }
 
 
 # Attendance summary for a specific employee
-@app.get("/attendance/{emp_no}")
-async def get_employee_attendance(emp_no: str, month: str, request: Request):
-    await verify_session(request, sessions_collection)
+@app.get("/attendance/{emp_no}", dependencies=[Depends(current_user)])
+async def get_employee_attendance(emp_no: str, month: str):
+    check_month(month)
 
     emp_no_clean = str(emp_no).split(".")[0]
-    record = await db["attendance"].find_one({"emp_no": emp_no_clean, "month": month})
+    record = await db["attendance"].find_one(
+        {"emp_no": emp_no_clean, "month": month},
+        projection={"_id": 0, "emp_name": 1, "type": 1, "attendance": 1, "summary": 1}
+    )
 
     if not record:
         return {"emp_no": emp_no_clean, "month": month, "attendance": {}, "summary": {}}
 
-    attendance = record.get("attendance", {})
-    total_days = len(attendance)
-    code_counts = defaultdict(int)
-    for status in attendance.values():
-        code = status.split("/")[0] if "/" in status else status
-        code_counts[code] += 1
-
-    summary = {
-        "total_days": total_days,
-        **code_counts  # dynamically include all codes
-    }
-
     return {
         "emp_no": emp_no_clean,
         "emp_name": record.get("emp_name"),
         "type": record.get("type"),
         "month": month,
-        "attendance": attendance,
-        "summary": dict(summary)
+        "attendance": record.get("attendance", {}),
+        "summary": record.get("summary", {})  # stored at write time
     }
 
 
 # ===================================
 # EXPORT ATTENDANCE EXCEL
 # ===================================
-@app.get("/attendance/legend")
-async def get_attendance_legend():
-    return {
-        "regular": REGULAR_LEGEND,
-        "apprentice": APPRENTICE_LEGEND,
-        "message": "Attendance code legends"
-    }
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
-@app.get("/export_regular")
-async def export_regular(month: str = "2025-07", request: Request = None, response: Response = None):
-    user = await verify_session(request, sessions_collection)
-    stream = await create_attendance_excel(db, "regular", month)
-    return StreamingResponse(
-        stream,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=regular_attendance_{month}.xlsx"}
-    )
 
-@app.get("/export_apprentice")
-async def export_apprentice(month: str = "2025-07", request: Request = None, response: Response = None):
-    user = await verify_session(request, sessions_collection)
-    stream = await create_attendance_excel(db, "apprentice", month)
+async def stream_and_cache(key: Tuple[str, str], fileobj, generation: int):
+    """Stream a freshly rendered export, caching its bytes once fully sent.
+
+    Nothing is cached if an invalidation ran after `generation` was taken,
+    as the workbook may predate that write.
+    """
+    chunks = []
+    async for chunk in iterate_in_threadpool(iter_file(fileobj)):
+        chunks.append(chunk)
+        yield chunk
+    if export_generation == generation:
+        export_cache[key] = b"".join(chunks)
+
+
+async def export_response(employee_type: str, month: str) -> StreamingResponse:
+    """Serve an attendance export, rendering it only on a cache miss."""
+    check_month(month)
+    key = (employee_type, month)
+    content = export_cache.get(key)
+    if content is None:
+        # Taken before the reads that build the workbook
+        generation = export_generation
+        stream = await create_attendance_excel(db, employee_type, month)
+        body = stream_and_cache(key, stream, generation)
+    else:
+        body = iter_file(BytesIO(content))
     return StreamingResponse(
-        stream,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename=apprentice_attendance_{month}.xlsx"}
+        body,
+        media_type=XLSX_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename={employee_type}_attendance_{month}.xlsx"}
     )
 
 
+@app.get("/export_regular", dependencies=[Depends(current_user)])
+async def export_regular(month: str = "2025-07"):
+    return await export_response("regular", month)
+
+@app.get("/export_apprentice", dependencies=[Depends(current_user)])
+async def export_apprentice(month: str = "2025-07"):
+    return await export_response("apprentice", month)
+
+
 # ===================================
 # PERMISSIONS MANAGEMENT
 # ===================================
@@ -1229,7 +1658,10 @@ async def get_admin_permissions(admin_email: str, request: Request):
         await auto_notify(request, user["email"], f"attempted to view permissions of {admin_email}")
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    admin_doc = await collection.find_one({"email": admin_email})
+    admin_doc = await collection.find_one(
+        {"email": admin_email},
+        projection={"_id": 0, "email": 1, "name": 1, "role": 1, "permissions": 1}
+    )
     if not admin_doc:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -1255,7 +1687,9 @@ async def update_admin_permissions(admin_email: str, request: Request, data: dic
         await auto_notify(request, user["email"], f"attempted to edit permissions of {admin_email}")
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    target = await collection.find_one({"email": admin_email})
+    target = await collection.find_one(
+        {"email": admin_email}, projection={"_id": 0, "role": 1, "permissions": 1}
+    )
     if not target:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -1272,6 +1706,7 @@ async def update_admin_permissions(admin_email: str, request: Request, data: dic
         {"email": admin_email},
         {"$set": {"permissions": perms}}
     )
+    invalidate_user(admin_email)
 
     return {"message": f"Permissions updated for {admin_email}", "updated_permissions": perms}
 
@@ -1285,17 +1720,19 @@ async def list_admins_permissions(request: Request):
         raise HTTPException(status_code=403, detail="Not authorized")
 
     # Fetch ONLY admins
-    cursor = collection.find({"role": "admin"})
-    admins = []
+    docs = await collection.find(
+        {"role": "admin"},
+        projection={"_id": 0, "email": 1, "name": 1, "permissions": 1}
+    ).to_list(length=None)
 
-    async for admin in cursor:
-        perms = admin.get("permissions") or DEFAULT_ADMIN_PERMISSIONS.copy()
-
-        admins.append({
+    admins = [
+        {
             "email": admin["email"],
             "name": admin.get("name", ""),
             "role": "admin",
-            "permissions": perms
-        })
+            "permissions": admin.get("permissions") or DEFAULT_ADMIN_PERMISSIONS.copy()
+        }
+        for admin in docs
+    ]
 
     return {"admins": admins, "count": len(admins)}
@@ -1,9 +1,11 @@
 from datetime import datetime, timedelta
-from io import BytesIO
-from typing import Dict, List
+from tempfile import SpooledTemporaryFile
+from typing import IO, Dict, List, Set
+import asyncio
 import calendar
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 from openpyxl.utils import get_column_letter
 
@@ -77,6 +79,9 @@ CODE_FILLS: Dict[str, PatternFill] = {
 
 WEEKDAYS_ABBR = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
 
+# Rendered exports stay in memory up to this size, then spill to disk
+EXPORT_SPOOL_SIZE = 1 << 20
+
 
 def _date_range(employee_type: str, month: str) -> List[datetime]:
     """Return list of datetime days in range based on employee type."""
@@ -94,91 +99,84 @@ def _date_range(employee_type: str, month: str) -> List[datetime]:
     return [start_date + timedelta(days=i) for i in range(total_days)]
 
 
-async def create_attendance_excel(db, employee_type: str, month: str) -> BytesIO:
-    """Build a calendar-styled attendance workbook."""
+async def create_attendance_excel(db, employee_type: str, month: str) -> IO[bytes]:
+    """Build a calendar-styled attendance workbook, returned as a file at offset 0."""
     # --------------------------
     # Fetch calendar & data
     # --------------------------
     dates = _date_range(employee_type, month)
     legend = REGULAR_LEGEND if employee_type.lower() == "regular" else APPRENTICE_LEGEND
 
-    emp_cursor = db["employees"].find({"type": employee_type})
-    employees = [emp async for emp in emp_cursor]
+    employees = await db["employees"].find(
+        {"type": employee_type}, projection={"_id": 0, "emp_no": 1, "name": 1, "designation": 1}
+    ).to_list(length=None)
 
     start_s, end_s = dates[0].strftime("%Y-%m-%d"), dates[-1].strftime("%Y-%m-%d")
-    hol_cursor = db["holidays"].find({"date": {"$gte": start_s, "$lte": end_s}})
-    holidays = {doc["date"] async for doc in hol_cursor}
-
-    att_cursor = db["attendance"].find({"type": employee_type, "month": month})
-    attendance = {doc["emp_no"]: doc.get("attendance", {}) async for doc in att_cursor}
-
-
-    # --------------------------
-    # Workbook & header section
-    # --------------------------
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Attendance"
+    hol_docs = await db["holidays"].find(
+        {"date": {"$gte": start_s, "$lte": end_s}}, projection={"_id": 0, "date": 1}
+    ).to_list(length=None)
+    holidays = {doc["date"] for doc in hol_docs}
+
+    # The regular range (11th to 10th) spans two month docs; day keys are
+    # unique across months, so each employee's maps merge cleanly
+    months = sorted({d.strftime("%Y-%m") for d in dates})
+    att_docs = await db["attendance"].find(
+        {"type": employee_type, "month": {"$in": months}},
+        projection={"_id": 0, "emp_no": 1, "attendance": 1}
+    ).to_list(length=None)
+    attendance: Dict[str, Dict[str, str]] = {}
+    for doc in att_docs:
+        attendance.setdefault(doc["emp_no"], {}).update(doc.get("attendance", {}))
+
+    # Styling + saving the workbook is CPU-bound; keep it off the event loop
+    return await asyncio.to_thread(
+        _build_attendance_workbook, month, dates, legend, employees, holidays, attendance
+    )
+
+
+def _styled(ws, value=None, font=None, alignment=None, border=None, fill=None) -> WriteOnlyCell:
+    """A write-only cell with the given styles applied."""
+    cell = WriteOnlyCell(ws, value=value)
+    if font is not None:
+        cell.font = font
+    if alignment is not None:
+        cell.alignment = alignment
+    if border is not None:
+        cell.border = border
+    if fill is not None:
+        cell.fill = fill
+    return cell
+
+
+def _merge(ws, row: int, start_col: int, end_col: int):
+    ws.merged_cells.add(f"{get_column_letter(start_col)}{row}:{get_column_letter(end_col)}{row}")
+
+
+def _build_attendance_workbook(
+    month: str,
+    dates: List[datetime],
+    legend: Dict[str, str],
+    employees: List[dict],
+    holidays: Set[str],
+    attendance: Dict[str, Dict[str, str]],
+) -> IO[bytes]:
+    """Render the workbook in write-only mode, row by row.
+
+    Rows are flushed to openpyxl's temp file as they are appended and the
+    result is saved to a spooled file, so memory stays flat however many
+    employees are exported.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Attendance")
 
     fixed_cols = 4
     total_cols = fixed_cols + len(dates)
+    title_rows = 4
+    header_row = title_rows + 2  # after the titles and a spacer row
+    data_start_row = header_row + 2
 
-    # Title rows
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=total_cols)
-    ws["A1"] = "SOUTH EASTERN RAILWAY"
-    ws["A1"].font = TITLE_FONT
-    ws["A1"].alignment = CENTER
-
-    ws.merge_cells(start_row=2, start_column=1, end_row=2, end_column=total_cols)
-    ws["A2"] = "ELECTRICAL DEPARTMENT"
-    ws["A2"].font = HEADER_FONT
-    ws["A2"].alignment = CENTER
-
-    ws.merge_cells(start_row=3, start_column=1, end_row=3, end_column=total_cols)
-    ws["A3"] = "OFFICE OF THE SENIOR SECTION ENGINEER (ELECT.)/SW/KGP"
-    ws["A3"].font = HEADER_FONT
-    ws["A3"].alignment = CENTER
-
-    ws.merge_cells(start_row=4, start_column=1, end_row=4, end_column=total_cols)
-    ws["A4"] = f"ATTENDANCE SHEET / MUSTER ROLL ({month})"
-    ws["A4"].font = TITLE_FONT
-    ws["A4"].alignment = CENTER
-
-    ws.append([])
-
-    # --------------------------
-    # Table header section
-    # --------------------------
-    header_row = ws.max_row + 1
-    titles = ["S.No", "NAME", "DESIGNATION", "EMPLOYEE NO."] + [d.strftime("%d/%m") for d in dates]
-    ws.append(titles)
-    ws.append(["", "", "", ""] + [WEEKDAYS_ABBR[d.weekday()] for d in dates])
-
-    for col, label in enumerate(["S.No", "NAME", "DESIGNATION", "EMPLOYEE NO."], start=1):
-        ws.merge_cells(start_row=header_row, start_column=col,
-                       end_row=header_row + 1, end_column=col)
-        cell = ws.cell(row=header_row, column=col, value=label)
-        cell.font = BOLD
-        cell.alignment = CENTER
-        cell.border = THIN_BORDER
-        cell.fill = HEADER_SHADE
-
-    for offset, d in enumerate(dates):
-        col = fixed_cols + 1 + offset
-        date_cell = ws.cell(row=header_row, column=col)
-        day_cell = ws.cell(row=header_row + 1, column=col)
-        date_cell.font = BOLD
-        day_cell.font = Font(bold=True, size=10)
-        date_cell.alignment, day_cell.alignment = CENTER, CENTER
-        date_cell.border, day_cell.border = THIN_BORDER, THIN_BORDER
-        if d.weekday() == 6:
-            date_cell.fill = SUNDAY_FILL
-            day_cell.fill = SUNDAY_FILL
-        if d.strftime("%Y-%m-%d") in holidays:
-            date_cell.fill = HOLIDAY_FILL
-            day_cell.fill = HOLIDAY_FILL
-
-    # Column widths
+    # Sheet-wide settings must be in place before the first row is written
+    ws.freeze_panes = f"E{data_start_row}"
     ws.column_dimensions["A"].width = 6
     ws.column_dimensions["B"].width = 30
     ws.column_dimensions["C"].width = 22
@@ -186,8 +184,52 @@ async def create_attendance_excel(db, employee_type: str, month: str) -> BytesIO
     for col in range(fixed_cols + 1, total_cols + 1):
         ws.column_dimensions[get_column_letter(col)].width = 10
 
-    data_start_row = header_row + 2
-    ws.freeze_panes = f"E{data_start_row}"
+    # --------------------------
+    # Title rows (1-4) + spacer
+    # --------------------------
+    titles = [
+        ("SOUTH EASTERN RAILWAY", TITLE_FONT),
+        ("ELECTRICAL DEPARTMENT", HEADER_FONT),
+        ("OFFICE OF THE SENIOR SECTION ENGINEER (ELECT.)/SW/KGP", HEADER_FONT),
+        (f"ATTENDANCE SHEET / MUSTER ROLL ({month})", TITLE_FONT),
+    ]
+    for row, (text, font) in enumerate(titles, start=1):
+        _merge(ws, row, 1, total_cols)
+        ws.append([_styled(ws, text, font=font, alignment=CENTER)])
+    ws.append([])
+
+    # --------------------------
+    # Table header section
+    # --------------------------
+    # Per-date lookups, formatted once instead of per employee cell:
+    # (attendance key "DD-MM-YYYY", holiday/Sunday fill or None).
+    # Holidays are stored as "YYYY-MM-DD"; a holiday shading wins over Sunday.
+    day_cols = []
+    for d in dates:
+        if d.strftime("%Y-%m-%d") in holidays:
+            day_fill = HOLIDAY_FILL
+        elif d.weekday() == 6:
+            day_fill = SUNDAY_FILL
+        else:
+            day_fill = None
+        day_cols.append((d.strftime("%d-%m-%Y"), day_fill))
+
+    # Two header rows: dates, then weekdays; the fixed titles span both
+    fixed_titles = ["S.No", "NAME", "DESIGNATION", "EMPLOYEE NO."]
+    for col in range(1, fixed_cols + 1):
+        ws.merged_cells.add(f"{get_column_letter(col)}{header_row}:{get_column_letter(col)}{header_row + 1}")
+
+    ws.append(
+        [_styled(ws, label, BOLD, CENTER, THIN_BORDER, HEADER_SHADE) for label in fixed_titles]
+        + [_styled(ws, d.strftime("%d/%m"), BOLD, CENTER, THIN_BORDER, fill)
+           for d, (_, fill) in zip(dates, day_cols)]
+    )
+    weekday_font = Font(bold=True, size=10)
+    ws.append(
+        [_styled(ws, None, border=THIN_BORDER, fill=HEADER_SHADE) for _ in fixed_titles]
+        + [_styled(ws, WEEKDAYS_ABBR[d.weekday()], weekday_font, CENTER, THIN_BORDER, fill)
+           for d, (_, fill) in zip(dates, day_cols)]
+    )
 
     # --------------------------
     # Employee rows
@@ -195,92 +237,76 @@ async def create_attendance_excel(db, employee_type: str, month: str) -> BytesIO
     row = data_start_row
     for idx, emp in enumerate(employees, start=1):
         ws.row_dimensions[row].height = 20  # <<< row height
-        ws.cell(row=row, column=1, value=idx).alignment = CENTER
-        ws.cell(row=row, column=2, value=emp.get("name", "")).font = NORMAL
-        ws.cell(row=row, column=3, value=emp.get("designation", "")).font = NORMAL
-        ws.cell(row=row, column=4, value=emp.get("emp_no", "")).font = NORMAL
-
+        cells = [
+            _styled(ws, idx, alignment=CENTER, border=THIN_BORDER),
+            _styled(ws, emp.get("name", ""), font=NORMAL, border=THIN_BORDER),
+            _styled(ws, emp.get("designation", ""), font=NORMAL, border=THIN_BORDER),
+            _styled(ws, emp.get("emp_no", ""), font=NORMAL, border=THIN_BORDER),
+        ]
         emp_att = attendance.get(emp.get("emp_no", ""), {})
-        for off, d in enumerate(dates):
-            col = fixed_cols + 1 + off
-            date_str = d.strftime("%Y-%m-%d")
-            code_val = emp_att.get(date_str, "")
-            code_key = str(code_val).split("/")[0] if code_val else ""
-            cell = ws.cell(row=row, column=col, value=code_val)
-            cell.alignment, cell.font, cell.border = CENTER, NORMAL, THIN_BORDER
-            if d.weekday() == 6:
-                cell.fill = SUNDAY_FILL
-            if date_str in holidays:
-                cell.fill = HOLIDAY_FILL
-            if code_key in CODE_FILLS:
-                cell.fill = CODE_FILLS[code_key]
-        for c in range(1, fixed_cols + 1):
-            ws.cell(row=row, column=c).border = THIN_BORDER
+        for att_key, day_fill in day_cols:
+            code_val = emp_att.get(att_key, "")
+            code_key = str(code_val).partition("/")[0] if code_val else ""
+            cells.append(_styled(
+                ws, code_val, NORMAL, CENTER, THIN_BORDER, CODE_FILLS.get(code_key, day_fill)
+            ))
+        ws.append(cells)
         row += 1
 
-    last_data_row = row - 1
-
     # --------------------------
     # Legends + Note + Signatures
     # --------------------------
-    row = last_data_row + 2
+    ws.append([])
+    row += 1
     legend_box_start_col, legend_box_end_col = 2, 12
 
+    def legend_box_row(cell: WriteOnlyCell):
+        """One bordered, merged row of the legends box (columns B-L)."""
+        nonlocal row
+        cell.border = THIN_BORDER
+        _merge(ws, row, legend_box_start_col, legend_box_end_col)
+        ws.append(
+            [None, cell]
+            + [_styled(ws, border=THIN_BORDER)
+               for _ in range(legend_box_start_col + 1, legend_box_end_col + 1)]
+        )
+        row += 1
+
     # LEGENDS title
-    ws.merge_cells(start_row=row, start_column=legend_box_start_col,
-                   end_row=row, end_column=legend_box_end_col)
-    tcell = ws.cell(row=row, column=legend_box_start_col, value="LEGENDS")
-    tcell.font = Font(bold=True, size=12)
-    tcell.alignment = CENTER
-    tcell.fill = HEADER_SHADE
+    legend_box_row(_styled(ws, "LEGENDS", Font(bold=True, size=12), CENTER, fill=HEADER_SHADE))
 
     # Create single paragraph with all legend codes
-    row += 1
     legend_codes_text = ", ".join([f"{k} = {v}" for k, v in legend.items()])
-    
     ws.row_dimensions[row].height = 40  # Adequate height for wrapped text
-    ws.merge_cells(start_row=row, start_column=legend_box_start_col,
-                   end_row=row, end_column=legend_box_end_col)
-    codes_cell = ws.cell(row=row, column=legend_box_start_col, value=legend_codes_text)
-    codes_cell.font = Font(size=11)
-    codes_cell.alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
+    legend_box_row(_styled(
+        ws, legend_codes_text, Font(size=11),
+        Alignment(horizontal="left", vertical="center", wrap_text=True),
+    ))
 
     # Note section
-    row += 1
     ws.row_dimensions[row].height = 35
-    ws.merge_cells(start_row=row, start_column=legend_box_start_col,
-                   end_row=row, end_column=legend_box_end_col)
-    ncell = ws.cell(row=row, column=legend_box_start_col, value=(
+    legend_box_row(_styled(ws, (
         "Note: The above abstract attendance particulars are taken from the "
         "attendance register for staff of O/O SSEE/SW/KGP. Due to unavoidable "
         "circumstances, manual entries may have been made by the signatory."
-    ))
-    
-    ncell.font = SMALL_ITALIC
-    ncell.alignment = JUSTIFY
-
-    # Apply borders to the entire legends box
-    legend_title_row = last_data_row + 3
-    block_end_row = row
-    for r in range(legend_title_row, block_end_row + 1):
-        for c in range(legend_box_start_col, legend_box_end_col + 1):
-            ws.cell(row=r, column=c).border = THIN_BORDER
+    ), SMALL_ITALIC, JUSTIFY))
 
     # Signature section
-    row += 2
-    ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=legend_box_end_col + 8)
-    ws.cell(row=row, column=1, value=(
+    ws.append([])
+    row += 1
+    _merge(ws, row, 1, legend_box_end_col + 8)
+    ws.append([_styled(ws, (
         "JE: ______________      SSEE: ______________      SSE/INCHARGE: ______________"
-    )).alignment = CENTER
+    ), alignment=CENTER)])
 
     # --------------------------
     # Page setup
     # --------------------------
-    ws.page_setup.orientation = ws.ORIENTATION_LANDSCAPE
+    ws.page_setup.orientation = "landscape"
     ws.page_setup.fitToWidth = 1
     ws.print_title_rows = f"{header_row}:{header_row+1}"
 
-    output = BytesIO()
+    output = SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE)
     wb.save(output)
     output.seek(0)
-    return output
\ No newline at end of file
+    return output
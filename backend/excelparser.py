@@ -0,0 +1,201 @@
+import logging
+from operator import itemgetter
+from typing import Dict, List, Optional
+
+from python_calamine import CalamineWorkbook
+
+logger = logging.getLogger(__name__)
+
+# --------------------------
+# Workbook layout
+# --------------------------
+REGULAR_SHEETS: List[str] = [
+    "ATTENDANCE_SSEE_SW_KGP_I",
+    "ATTENDANCE_SSEE_SW_KGP_II",
+    "ATTENDANCE_SSEE_SW_KGP_III",
+]
+APPRENTICE_SHEET = "APPRENTICE ATTENDANCE"
+
+# Header row (1-based) of each sheet kind
+REGULAR_HEADER_ROW = 7
+APPRENTICE_HEADER_ROW = 9
+HOLIDAY_HEADER_ROW = 2
+
+# Sheet column title -> employee field
+EMPLOYEE_COLUMNS: Dict[str, str] = {
+    "EMPLOYEE NO.": "emp_no",
+    "NAME": "name",
+    "DESIGNATION": "designation",
+}
+
+HOLIDAY_REQUIRED = {"Name of the Occasion", "Date"}
+
+
+def init_worker():
+    """Process-pool initializer: log straight to stderr in parse workers.
+
+    Forked workers would otherwise inherit the parent's QueueHandler, whose
+    listener thread does not exist in the child.
+    """
+    logging.basicConfig(level=logging.INFO, force=True)
+
+
+def _value(value):
+    """Normalise a calamine cell: None for empty cells, int for whole numbers.
+
+    calamine returns '' for blanks and floats for every number; callers
+    expect the None / int values openpyxl used to give.
+    """
+    if value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _cell_str(value) -> str:
+    """Stringify a cell value, treating empty cells as ''."""
+    return "" if value is None else str(value).strip()
+
+
+def _cell(row: list, idx: Optional[int]):
+    """Return row[idx] normalised, or None when the column is absent/short."""
+    if idx is None or idx >= len(row):
+        return None
+    return _value(row[idx])
+
+
+def _header_index(header: list) -> Dict[str, int]:
+    """Map stripped header titles to their column index."""
+    return {_cell_str(v): i for i, v in enumerate(map(_value, header)) if v is not None}
+
+
+def _sheet_rows(wb: CalamineWorkbook, name: str) -> List[list]:
+    """All rows of a sheet, anchored at A1 so header row numbers hold."""
+    return wb.get_sheet_by_name(name).to_python(skip_empty_area=False)
+
+
+def clean_emp_no(value) -> str:
+    """Normalise an employee number read from Excel (e.g. 5071.0 -> '5071')."""
+    return str(value).strip().split(".")[0].replace(" ", "")
+
+
+# --------------------------
+# Employees
+# --------------------------
+def _parse_employee_sheet(rows: List[list], header_row: int, emp_type: str) -> List[Dict[str, str]]:
+    header_cells = rows[header_row - 1] if len(rows) >= header_row else []
+    header = {k.upper(): i for k, i in _header_index(header_cells).items()}
+    cols = {field: header[title] for title, field in EMPLOYEE_COLUMNS.items()}
+
+    # Rows are rectangular, so plain indexing is safe; only the three
+    # needed cells per row are picked and normalised.
+    pick = itemgetter(cols["emp_no"], cols["name"], cols["designation"])
+
+    employees = []
+    for emp_no, name, designation in map(pick, rows[header_row:]):
+        emp_no = _value(emp_no)
+        if emp_no is None:
+            continue
+        if isinstance(emp_no, str) and emp_no.strip().isdigit():
+            # Numeric text is read as a number (as pandas did), so existing
+            # emp_no keys such as '3229807783' stay stable across uploads.
+            emp_no = int(emp_no)
+        employees.append({
+            # Whole numbers (the common case) need no cleaning
+            "emp_no": str(emp_no) if isinstance(emp_no, int) else clean_emp_no(emp_no),
+            "name": _cell_str(_value(name)),
+            "designation": _cell_str(_value(designation)),
+            "type": emp_type,
+        })
+    return employees
+
+
+def parse_employee_workbook(source) -> List[Dict[str, str]]:
+    """Read regular + apprentice employees from the muster roll workbook.
+
+    The workbook is opened once with calamine (a Rust reader) and each
+    sheet's cell values are read in a single call.
+    """
+    wb = CalamineWorkbook.from_object(source)
+    try:
+        all_employees: List[Dict[str, str]] = []
+        sheetnames = set(wb.sheet_names)
+
+        for sheet in REGULAR_SHEETS:
+            if sheet not in sheetnames:
+                continue
+            try:
+                all_employees.extend(
+                    _parse_employee_sheet(_sheet_rows(wb, sheet), REGULAR_HEADER_ROW, "regular")
+                )
+            except Exception as e:
+                logger.warning(f"Error reading regular sheet {sheet}: {e}")
+
+        if APPRENTICE_SHEET in sheetnames:
+            try:
+                all_employees.extend(
+                    _parse_employee_sheet(_sheet_rows(wb, APPRENTICE_SHEET), APPRENTICE_HEADER_ROW, "apprentice")
+                )
+            except Exception as e:
+                logger.warning(f"Error reading apprentice sheet: {e}")
+
+        return all_employees
+    finally:
+        wb.close()
+
+
+# --------------------------
+# Holidays
+# --------------------------
+def _find_holiday_sheet(sheets: List[str]) -> Optional[str]:
+    """Prefer an exact 'holidays' sheet, else any sheet containing 'holiday'."""
+    normalized = {s.strip().lower(): s for s in sheets}
+    if "holidays" in normalized:
+        return normalized["holidays"]
+    for sname in sheets:
+        if "holiday" in sname.lower():
+            return sname
+    return None
+
+
+def parse_holiday_workbook(source) -> List[Dict]:
+    """Read raw holiday rows (name, date, day, year) from the HOLIDAYS sheet.
+
+    Raises ValueError for a missing sheet/columns (plain exceptions, so they
+    survive the trip back from a worker process).
+    """
+    wb = CalamineWorkbook.from_object(source)
+    try:
+        sheets = wb.sheet_names
+        logger.info(f"[HOLIDAYS UPLOAD] Sheets found: {sheets}")
+
+        sheet = _find_holiday_sheet(sheets)
+        if not sheet:
+            raise ValueError(f"No HOLIDAYS sheet found. Sheets detected: {sheets}")
+
+        rows = _sheet_rows(wb, sheet)
+        header = _header_index(rows[HOLIDAY_HEADER_ROW - 1] if len(rows) >= HOLIDAY_HEADER_ROW else [])
+
+        missing = HOLIDAY_REQUIRED - set(header)
+        if missing:
+            raise ValueError(
+                f"Missing required columns: {sorted(list(missing))}. Found columns: {list(header)}"
+            )
+
+        holidays = []
+        for row in rows[HOLIDAY_HEADER_ROW:]:
+            name = _cell(row, header["Name of the Occasion"])
+            date = _cell(row, header["Date"])
+            # Drop rows missing essential data
+            if name is None or date is None:
+                continue
+            holidays.append({
+                "name": _cell_str(name),
+                "date": _cell_str(date),
+                "day": _cell_str(_cell(row, header.get("Day"))),
+                "year": _cell(row, header.get("Year")),
+            })
+        return holidays
+    finally:
+        wb.close()
@@ -1,13 +1,13 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import asyncio
 import secrets
-import pytz
+from cachetools import TTLCache
 from fastapi import HTTPException
 
 # =========================
 # Timezone setup
 # =========================
-kolkata_tz = pytz.timezone("Asia/Kolkata")
-utc_tz = pytz.UTC
+utc_tz = timezone.utc  # stdlib tzinfo; cheaper than pytz for now()
 
 # =========================
 # Admin default permissions
@@ -27,28 +27,39 @@ DEFAULT_ADMIN_PERMISSIONS = {
 # =========================
 SESSION_DURATION = timedelta(days=7)
 
+# =========================
+# In-process caches
+# =========================
+# Short-lived so expiry/permission changes are picked up quickly, while
+# skipping MongoDB for bursts of requests on the same session.
+CACHE_TTL_SECONDS = 60
+session_cache = TTLCache(maxsize=4096, ttl=CACHE_TTL_SECONDS)  # session_id -> session data
+user_cache = TTLCache(maxsize=1024, ttl=CACHE_TTL_SECONDS)     # email -> user doc
+
+# In-flight session lookups, so a burst of requests on a cold session
+# shares one MongoDB round-trip instead of each issuing its own.
+_pending_sessions = {}  # session_id -> asyncio.Task
+
+
+def invalidate_user(email: str):
+    """Drop a cached user doc (call after changing role/permissions)."""
+    user_cache.pop(email, None)
+
 # ====================================
 # CREATE OR REUSE SESSION
 # ====================================
 async def create_session(sessions_collection, user_email: str, device_info: str, user_data: dict):
     now = datetime.now(utc_tz)
-    existing = await sessions_collection.find_one(
-        {"data.email": user_email, "device_info": device_info}
-    )
 
+    # Refresh a still-valid session for this user/device in one round-trip.
+    # Expired sessions are never matched; the TTL index on `expiry` removes them.
+    existing = await sessions_collection.find_one_and_update(
+        {"data.email": user_email, "device_info": device_info, "expiry": {"$gt": now}},
+        {"$set": {"expiry": now + SESSION_DURATION, "last_accessed": now}},
+        projection={"session_id": 1},
+    )
     if existing:
-        expiry = existing.get("expiry")
-        if expiry and expiry.tzinfo is None:
-            expiry = expiry.replace(tzinfo=utc_tz)
-        if expiry and expiry < now:
-            await sessions_collection.delete_one({"_id": existing["_id"]})
-        else:
-            new_expiry = now + SESSION_DURATION
-            await sessions_collection.update_one(
-                {"_id": existing["_id"]},
-                {"$set": {"expiry": new_expiry, "last_accessed": now}},
-            )
-            return existing["session_id"]
+        return existing["session_id"]
 
     session_id = secrets.token_hex(32)
     session_doc = {
@@ -66,32 +77,41 @@ async def create_session(sessions_collection, user_email: str, device_info: str,
 # ====================================
 # GET / VALIDATE SESSION
 # ====================================
-async def get_session(sessions_collection, session_id: str):
-    session = await sessions_collection.find_one({"session_id": session_id})
+async def _load_session(sessions_collection, session_id: str):
+    # Validate + extend expiry in a single round-trip
+    now = datetime.now(utc_tz)
+    session = await sessions_collection.find_one_and_update(
+        {"session_id": session_id, "expiry": {"$gt": now}},
+        {"$set": {"expiry": now + SESSION_DURATION, "last_accessed": now}},
+        projection={"data": 1},
+    )
     if not session:
         return None
 
-    now = datetime.now(utc_tz)
-    expiry = session.get("expiry")
-    if expiry and expiry.tzinfo is None:
-        expiry = expiry.replace(tzinfo=utc_tz)
+    session_cache[session_id] = session["data"]
+    return session["data"]
 
-    if not expiry or expiry < now:
-        await sessions_collection.delete_one({"_id": session["_id"]})
-        return None
 
-    # Extend session expiry
-    await sessions_collection.update_one(
-        {"_id": session["_id"]},
-        {"$set": {"expiry": now + SESSION_DURATION, "last_accessed": now}},
-    )
+async def get_session(sessions_collection, session_id: str):
+    cached = session_cache.get(session_id)
+    if cached is not None:
+        return dict(cached)
 
-    return session["data"]
+    task = _pending_sessions.get(session_id)
+    if task is None:
+        task = asyncio.ensure_future(_load_session(sessions_collection, session_id))
+        _pending_sessions[session_id] = task
+        task.add_done_callback(lambda _: _pending_sessions.pop(session_id, None))
+
+    # shield: one cancelled request must not cancel the lookup for the others
+    data = await asyncio.shield(task)
+    return dict(data) if data else None
 
 # ====================================
 # DELETE SESSION (Manual Logout)
 # ====================================
 async def delete_session(sessions_collection, session_id: str):
+    session_cache.pop(session_id, None)
     result = await sessions_collection.delete_one({"session_id": session_id})
     return result.deleted_count > 0
 
@@ -103,25 +123,36 @@ async def cleanup_expired_sessions(sessions_collection):
     await sessions_collection.delete_many({"expiry": {"$lt": now}})
 
 # ====================================
-# VERIFY SESSION
+# READ SESSION TOKEN
 # ====================================
-async def verify_session(request, sessions_collection):
+def get_session_token(request):
     """
-    Verify session from:
+    Read the session token from:
     - Authorization: Bearer <token>
     - OR session_id cookie
     """
-
-    session_id = None
-
     # 1. Check Authorization header
     auth_header = request.headers.get("Authorization")
     if auth_header and auth_header.startswith("Bearer "):
-        session_id = auth_header.split("Bearer ")[1].strip()
+        token = auth_header[len("Bearer "):].strip()
+        if token:
+            return token
 
     # 2. If no header token → check cookie
-    if not session_id:
-        session_id = request.cookies.get("session_id")
+    return request.cookies.get("session_id")
+
+# ====================================
+# VERIFY SESSION
+# ====================================
+async def verify_session(request, sessions_collection):
+    """Resolve the current user's session (token lookup + validation + permissions)."""
+
+    # Resolved at most once per request, however many callers ask
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+
+    session_id = get_session_token(request)
 
     # 3. No token at all
     if not session_id:
@@ -133,15 +164,21 @@ async def verify_session(request, sessions_collection):
         raise HTTPException(status_code=401, detail="Invalid or expired session")
 
     # 5. Load latest user record
-    from app import collection  # Same Mongo users collection
-    user_doc = await collection.find_one({"email": session_data["email"]})
+    user_doc = user_cache.get(session_data["email"])
+    if user_doc is None:
+        from app import collection  # Same Mongo users collection
+        user_doc = await collection.find_one(
+            {"email": session_data["email"]}, projection={"permissions": 1}
+        )
 
-    if not user_doc:
-        raise HTTPException(status_code=401, detail="User not found")
+        if not user_doc:
+            raise HTTPException(status_code=401, detail="User not found")
+        user_cache[session_data["email"]] = user_doc
 
     # Always merge fresh permissions
     session_data["permissions"] = (
         user_doc.get("permissions") or DEFAULT_ADMIN_PERMISSIONS.copy()
     )
 
+    request.state.user = session_data
     return session_data